@@ -10,14 +10,23 @@ from utils import (
     load_or_download_dataset,
     clean_data,
     infer_columns,
+    project_used_columns,
     compute_affordability,
+    to_contiguous_columns,
     summarize_affordability,
     recommend_actions,
     estimate_struggling,
+    lttb_downsample_indices,
 )
 
 # Optional plotting libraries
 import plotly.express as px
+import plotly.graph_objects as go
+
+try:
+    import pydeck as pdk
+except Exception:
+    pdk = None  # type: ignore
 
 try:
     import folium
@@ -26,14 +35,18 @@ except Exception:
     folium = None
     st_folium = None  # type: ignore
 
-# Guard optional statsmodels for trendline
 try:
-    import statsmodels.api as sm  # noqa: F401
-    _HAS_SM = True
+    import datashader as ds
+    import datashader.transfer_functions as tf
 except Exception:
-    _HAS_SM = False
+    ds = None  # type: ignore
+    tf = None  # type: ignore
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Upper bound on points shipped to the browser for the Income vs Rent scatter
+SCATTER_MAX_POINTS = 5000
+# Above this many areas the per-area bar chart is rasterized with datashader (when installed)
+AREA_RASTER_THRESHOLD = 200
 
 st.set_page_config(page_title="Affordable Housing Needs Mapper", layout="wide")
 
@@ -63,19 +76,50 @@ def _data_fingerprint() -> str:
         pass
     return "|".join(parts)
 
-@st.cache_data(show_spinner=True)
-def get_data(_fingerprint: str) -> pd.DataFrame:
+# Persisted to disk so a process restart reloads the pickled frame instead of re-parsing the CSV.
+# The fingerprint must be hashed (no leading underscore) so edits to the data files invalidate the cache.
+@st.cache_data(show_spinner=True, persist="disk", max_entries=4)
+def get_data(fingerprint: str) -> pd.DataFrame:
     df, _path = load_or_download_dataset(APP_DIR)
-    df = clean_data(df)
+    df = df.rename(columns=str.strip)
     area_col, rent_col, income_col, _geom = infer_columns(df)
+    # Clean only the columns the page reads; affordability is then computed in one array pass
+    df = clean_data(project_used_columns(df, area_col, rent_col, income_col))
     df = compute_affordability(df, area_col, rent_col, income_col)
+    df = to_contiguous_columns(df)
     df["__area_col"] = area_col
     df["__rent_col"] = rent_col if rent_col else ""
     df["__income_col"] = income_col if income_col else ""
     return df
 
+# Figures are pure functions of the cached data and the income filter, so reruns reuse them.
+# cache_resource keeps the Figure objects as-is (no pickling); underscore args are not hashed.
+@st.cache_resource(show_spinner=False, max_entries=16)
+def build_summary_bar(fingerprint: str, income_group: str, area_col: str, _summary: pd.DataFrame) -> go.Figure:
+    return px.bar(
+        _summary,
+        x=area_col,
+        y="median_affordability_index",
+        color="affordability_class",
+        title="Median Affordability Index by Area",
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def build_stress_bar(fingerprint: str, income_group: str, area_col: str, _per_area: pd.DataFrame) -> go.Figure:
+    per_area_sorted = _per_area.sort_values("struggling_pct", ascending=False)
+    fig = px.bar(
+        per_area_sorted,
+        x=area_col,
+        y=(per_area_sorted["struggling_pct"] * 100.0),
+        labels={"y": "Struggling %"},
+        title="Struggling Households Share by Area",
+    )
+    fig.update_yaxes(title="Struggling %")
+    return fig
+
+data_fingerprint = _data_fingerprint()
 try:
-    df = get_data(_data_fingerprint())
+    df = get_data(data_fingerprint)
 except Exception as e:
     st.error(f"Failed to load dataset: {e}")
     st.stop()
@@ -96,136 +140,220 @@ if "Median_Annual_Household_Income_INR" in df.columns:
     income_col = "Median_Annual_Household_Income_INR"
     df["__income_col"] = income_col
 
+# Prefer explicit Latitude/Longitude for Mumbai CSV, else look for common lat/lon names
 if "Latitude" in df.columns and "Longitude" in df.columns:
-    lat_col_hint = "Latitude"
-    lon_col_hint = "Longitude"
+    lat_col = "Latitude"
+    lon_col = "Longitude"
 else:
-    lat_col_hint = None
-    lon_col_hint = None
+    lat_col = None
+    lon_col = None
+    for name in df.columns:
+        low = name.lower()
+        if low in {"lat", "latitude"}:
+            lat_col = name
+        if low in {"lon", "longitude", "lng"}:
+            lon_col = name
 
 # Income group segmentation (heuristic based on income distribution)
 if income_col is not None and income_col in df.columns:
-    income_values = pd.to_numeric(df[income_col], errors="coerce")
-    q1, q2, q3 = income_values.quantile([0.33, 0.66, 1.0])
-    def label_income(v: float) -> str:
-        if np.isnan(v):
-            return "unknown"
-        if v <= q1:
-            return "low-income"
-        if v <= q2:
-            return "median-income"
-        return "high-income"
-    df["income_group"] = income_values.apply(label_income)
+    income_values = pd.to_numeric(df[income_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    q1, q2 = np.nanquantile(income_values, [0.33, 0.66]) if np.isfinite(income_values).any() else (np.nan, np.nan)
+    # <= q1 -> low, <= q2 -> median, else high; searchsorted tolerates q1 == q2 where pd.cut would reject the bins
+    codes = np.searchsorted(np.array([q1, q2]), income_values, side="left")
+    codes[np.isnan(income_values)] = 3
+    df["income_group"] = pd.Categorical.from_codes(
+        codes, categories=["low-income", "median-income", "high-income", "unknown"]
+    )
 else:
     df["income_group"] = "unknown"
 
-# Apply sidebar filters
+# Apply sidebar filters: one row mask, then take only the columns the page renders
+df_view = df
 if income_group_select and income_group_select != "All":
-    df = df[df["income_group"] == income_group_select]
+    view_cols = list(dict.fromkeys(
+        c for c in [area_col, rent_col, income_col, lat_col, lon_col, "affordability_index", "affordability_class", "income_group"]
+        if c and c in df.columns
+    ))
+    mask = (df["income_group"] == income_group_select).to_numpy()
+    df_view = df.iloc[np.flatnonzero(mask), [df.columns.get_loc(c) for c in view_cols]]
+
+# Shared by Key Stats and the per-area stress chart
+overall_cnt, overall_pct, per_area = estimate_struggling(df_view, area_col, threshold=50.0)
 
 col1, col2 = st.columns([2, 1])
 
 with col1:
     st.subheader("Affordability Map")
-    if folium and st_folium:
-        # Prefer explicit Latitude/Longitude for Mumbai CSV
-        lat_col = lat_col_hint
-        lon_col = lon_col_hint
-        if not lat_col or not lon_col:
-            for name in df.columns:
-                low = name.lower()
-                if low in {"lat", "latitude"}:
-                    lat_col = name
-                if low in {"lon", "longitude", "lng"}:
-                    lon_col = name
-        if lat_col and lon_col and lat_col in df.columns and lon_col in df.columns:
-            fmap = folium.Map(location=[pd.to_numeric(df[lat_col], errors="coerce").median(), pd.to_numeric(df[lon_col], errors="coerce").median()], zoom_start=11, tiles="cartodbpositron")
-            for _, row in df.iterrows():
-                color = {
-                    "Affordable": "green",
-                    "Moderate": "orange",
-                    "Expensive": "red",
-                }.get(row.get("affordability_class", "Unknown"), "gray")
-                try:
-                    lat = float(row[lat_col])
-                    lon = float(row[lon_col])
-                except Exception:
-                    continue
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=6,
-                    color=color,
-                    fill=True,
-                    fill_opacity=0.7,
-                    popup=f"{area_col}: {row.get(area_col, 'N/A')}\nIndex: {row.get('affordability_index', np.nan):.1f}",
-                ).add_to(fmap)
-            st_folium(fmap, width=None, height=520)
+    if pdk is not None or (folium and st_folium):
+        if lat_col and lon_col and lat_col in df_view.columns and lon_col in df_view.columns:
+            lat_values = pd.to_numeric(df_view[lat_col], errors="coerce")
+            lon_values = pd.to_numeric(df_view[lon_col], errors="coerce")
+            if pdk is not None:
+                # Single WebGL scatter layer: colors and tooltips are built column-wise, no per-row Python work
+                aff_class = df_view["affordability_class"]
+                color_code = np.select(
+                    [aff_class.eq("Affordable"), aff_class.eq("Moderate"), aff_class.eq("Expensive")],
+                    [0, 1, 2],
+                    default=3,
+                )
+                rgb = np.array([[0, 200, 0], [255, 165, 0], [255, 0, 0], [128, 128, 128]], dtype=np.uint8)[color_code]
+                map_df = pd.DataFrame(
+                    {
+                        "lat": lat_values.to_numpy(dtype=np.float32, na_value=np.nan),
+                        "lon": lon_values.to_numpy(dtype=np.float32, na_value=np.nan),
+                        "r": rgb[:, 0],
+                        "g": rgb[:, 1],
+                        "b": rgb[:, 2],
+                        "area": df_view[area_col].astype(str).to_numpy(),
+                        "index": df_view["affordability_index"].round(1).to_numpy(dtype=float, na_value=np.nan),
+                    }
+                ).dropna(subset=["lat", "lon"])
+                layer = pdk.Layer(
+                    "ScatterplotLayer",
+                    data=map_df,
+                    get_position=["lon", "lat"],
+                    get_fill_color="[r, g, b, 180]",
+                    get_radius=80,
+                    radius_min_pixels=4,
+                    pickable=True,
+                )
+                view = pdk.ViewState(latitude=float(lat_values.median()), longitude=float(lon_values.median()), zoom=11)
+                deck = pdk.Deck(
+                    layers=[layer],
+                    initial_view_state=view,
+                    map_style="light",
+                    tooltip={"text": f"{area_col}: {{area}}\nIndex: {{index}}"},
+                )
+                st.pydeck_chart(deck, use_container_width=True)
+            else:
+                fmap = folium.Map(location=[lat_values.median(), lon_values.median()], zoom_start=11, tiles="cartodbpositron")
+                # Colors and popups are formatted column-wise; the loop only walks plain arrays
+                colors = (
+                    df_view["affordability_class"].astype(object)
+                    .map({"Affordable": "green", "Moderate": "orange", "Expensive": "red"})
+                    .fillna("gray")
+                    .to_numpy()
+                )
+                popups = (
+                    f"{area_col}: " + df_view[area_col].astype(str)
+                    + "\nIndex: " + df_view["affordability_index"].round(1).astype(str)
+                ).to_numpy()
+                lats = lat_values.to_numpy(dtype=float, na_value=np.nan)
+                lons = lon_values.to_numpy(dtype=float, na_value=np.nan)
+                valid = ~(np.isnan(lats) | np.isnan(lons))
+                for lat, lon, color, popup in zip(lats[valid], lons[valid], colors[valid], popups[valid]):
+                    folium.CircleMarker(
+                        location=[lat, lon],
+                        radius=6,
+                        color=color,
+                        fill=True,
+                        fill_opacity=0.7,
+                        popup=popup,
+                    ).add_to(fmap)
+                st_folium(fmap, width=None, height=520)
         else:
             st.info("No latitude/longitude columns found for map rendering in this dataset.")
     else:
-        st.warning("folium/streamlit-folium not available. Install dependencies to see the map.")
+        st.warning("pydeck or folium/streamlit-folium not available. Install dependencies to see the map.")
 
 with col2:
     st.subheader("Key Stats")
-    stats_all = df["affordability_index"].describe()
-    overall = stats_all[["count", "mean", "50%", "min", "max"]].rename({"50%": "median"})
+    arr = df_view["affordability_index"].to_numpy(dtype=float, na_value=np.nan)
+    arr = arr[~np.isnan(arr)]
+    if arr.size:
+        overall = {"count": arr.size, "mean": arr.mean(), "median": np.median(arr), "min": arr.min(), "max": arr.max()}
+    else:
+        overall = {"count": 0, "mean": np.nan, "median": np.nan, "min": np.nan, "max": np.nan}
     st.metric("Median Affordability Index", f"{overall['median']:.1f}")
     st.metric("Mean Affordability Index", f"{overall['mean']:.1f}")
     st.metric("Max Affordability Index", f"{overall['max']:.1f}")
     # Struggling estimate
-    overall_cnt, overall_pct, per_area = estimate_struggling(df, area_col, threshold=50.0)
     st.metric("Households Struggling (>50)", f"{overall_cnt}", help="Count of rows exceeding affordability index 50")
     st.metric("Share Struggling", f"{overall_pct*100:.1f}%")
 
 st.subheader("Income vs Rent")
-if rent_col and income_col and rent_col in df.columns and income_col in df.columns:
-    trendline_value = "ols" if _HAS_SM else None
+if rent_col and income_col and rent_col in df_view.columns and income_col in df_view.columns:
+    # Closed-form least-squares trend over all rows (before any downsampling)
+    x_all = pd.to_numeric(df_view[income_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    y_all = pd.to_numeric(df_view[rent_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    fit_mask = np.isfinite(x_all) & np.isfinite(y_all)
+    trend = None
+    if np.unique(x_all[fit_mask]).size >= 2:
+        slope, intercept = np.polyfit(x_all[fit_mask], y_all[fit_mask], 1)
+        x_min, x_max = x_all[fit_mask].min(), x_all[fit_mask].max()
+        trend = ([x_min, x_max], [slope * x_min + intercept, slope * x_max + intercept])
+    # Encode the class as an integer so Plotly emits one WebGL trace instead of one per category
+    class_codes = {"Affordable": 0, "Moderate": 1, "Expensive": 2}
+    scatter_cols = list(dict.fromkeys([income_col, rent_col, area_col, "affordability_class"]))
+    scatter_df = df_view[scatter_cols].assign(
+        _ac_code=df_view["affordability_class"].map(class_codes).fillna(3).astype("int8")
+    )
+    if len(scatter_df) > SCATTER_MAX_POINTS:
+        scatter_df = scatter_df.assign(
+            **{income_col: pd.to_numeric(scatter_df[income_col], errors="coerce"), rent_col: pd.to_numeric(scatter_df[rent_col], errors="coerce")}
+        ).dropna(subset=[income_col, rent_col])
+        keep = lttb_downsample_indices(scatter_df[income_col].to_numpy(dtype=float), scatter_df[rent_col].to_numpy(dtype=float), SCATTER_MAX_POINTS)
+        scatter_df = scatter_df.iloc[keep]
+        st.caption(f"Showing {len(scatter_df):,} representative points (LTTB) of {len(df_view):,} rows.")
     fig = px.scatter(
-        df,
+        scatter_df,
         x=income_col,
         y=rent_col,
-        color="affordability_class",
-        hover_data=[area_col],
-        trendline=trendline_value,
+        color="_ac_code",
+        color_continuous_scale=[
+            (0.0, "green"), (0.25, "green"),
+            (0.25, "orange"), (0.5, "orange"),
+            (0.5, "red"), (0.75, "red"),
+            (0.75, "gray"), (1.0, "gray"),
+        ],
+        range_color=[-0.5, 3.5],
+        hover_data={area_col: True, "affordability_class": True, "_ac_code": False},
+        render_mode="webgl",
         labels={income_col: "Annual Income", rent_col: "Monthly Rent" if "month" in rent_col.lower() else rent_col},
         title="Income vs Rent/Price with Affordability Classification",
     )
+    fig.update_coloraxes(
+        colorbar=dict(
+            title="affordability_class",
+            tickvals=[0, 1, 2, 3],
+            ticktext=["Affordable", "Moderate", "Expensive", "Unknown"],
+        )
+    )
+    if trend is not None:
+        fig.add_scatter(x=trend[0], y=trend[1], mode="lines", name="trend", line=dict(color="black", dash="dash"), showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
 else:
     st.info("Income or rent columns not identified; showing affordability distribution instead.")
-    fig = px.histogram(df, x="affordability_index", nbins=30, color="affordability_class")
+    fig = go.Figure(go.Histogram(x=df_view["affordability_index"], nbinsx=30))
+    fig.update_layout(xaxis_title="affordability_index", yaxis_title="count")
     st.plotly_chart(fig, use_container_width=True)
 
 st.subheader("Affordability by Area (Median Index)")
-summary = summarize_affordability(df, area_col)
-bar = px.bar(
-    summary,
-    x=area_col,
-    y="median_affordability_index",
-    color="affordability_class",
-    title="Median Affordability Index by Area",
-)
-st.plotly_chart(bar, use_container_width=True)
+summary = summarize_affordability(df_view, area_col)
+if ds is not None and summary[area_col].nunique() > AREA_RASTER_THRESHOLD:
+    class_colors = {"Affordable": "green", "Moderate": "orange", "Expensive": "red", "Unknown": "gray"}
+    raster = summary.assign(
+        _area_code=summary[area_col].astype("category").cat.codes.astype("float64"),
+        affordability_class=summary["affordability_class"].fillna("Unknown").astype(pd.CategoricalDtype(list(class_colors))),
+    )
+    cvs = ds.Canvas(plot_width=1200, plot_height=400)
+    agg = cvs.points(raster, "_area_code", "median_affordability_index", agg=ds.count_cat("affordability_class"))
+    img = tf.spread(tf.shade(agg, color_key=class_colors), px=1).to_pil()
+    st.image(img, caption=f"Median Affordability Index across {summary[area_col].nunique():,} areas (x: area, y: index)", use_container_width=True)
+else:
+    bar = build_summary_bar(data_fingerprint, income_group_select, area_col, summary)
+    st.plotly_chart(bar, use_container_width=True)
 
 # Top-N areas by struggling percent
 st.subheader("Top Areas by Housing Stress (Struggling %)")
 try:
-    _, _, per_area = estimate_struggling(df, area_col, threshold=50.0)
-    per_area_sorted = per_area.sort_values("struggling_pct", ascending=False)
-    bar2 = px.bar(
-        per_area_sorted,
-        x=area_col,
-        y=(per_area_sorted["struggling_pct"] * 100.0),
-        labels={"y": "Struggling %"},
-        title="Struggling Households Share by Area",
-    )
-    bar2.update_yaxes(title="Struggling %")
+    bar2 = build_stress_bar(data_fingerprint, income_group_select, area_col, per_area)
     st.plotly_chart(bar2, use_container_width=True)
 except Exception as e:
     st.info("Unable to compute per-area stress metrics.")
 
 st.subheader("Recommendations")
-for rec in recommend_actions(df, area_col, top_k=5):
+for rec in recommend_actions(df_view, area_col, top_k=5):
     st.write("- ", rec)
 
 st.caption(
@@ -12,6 +12,32 @@ try:
 except Exception:
     gpd = None  # type: ignore
 
+# Optional fast CSV parsing and compiled address parser for very large Address columns
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None  # type: ignore
+
+try:
+    import numba
+except Exception:
+    numba = None  # type: ignore
+
+
+AFFORDABILITY_CLASSES = ["Unknown", "Affordable", "Moderate", "Expensive"]
+# Columns the app reads from the Mumbai CSV; other columns are skipped at parse time
+MUMBAI_COLUMNS = {
+    "Neighborhood",
+    "Latitude",
+    "Longitude",
+    "Avg_Rent_Monthly_INR",
+    "Median_Annual_Household_Income_INR",
+    "Address",
+    "Affordability_Index",
+}
+# Below this many rows the pandas .str path is faster than compiling the numba kernel
+NUMBA_ADDRESS_MIN_ROWS = 200_000
+
 
 def ensure_data_dir(base_dir: str) -> str:
     data_dir = os.path.join(base_dir, "data")
@@ -51,26 +77,80 @@ def download_kaggle_dataset(target_dir: str) -> Optional[str]:
         return None
 
 
+if numba is not None:
+    @numba.njit(cache=True, inline="always")
+    def _is_ascii_space(b: int) -> bool:
+        return b == 32 or 9 <= b <= 13
+
+    @numba.njit(parallel=True, cache=True)
+    def _city_spans(data: np.ndarray, offsets: np.ndarray) -> TypingTuple[np.ndarray, np.ndarray]:
+        """Return (start, length) byte spans of the city token for each UTF-8 string."""
+        n = len(offsets) - 1
+        starts = np.empty(n, dtype=np.int64)
+        lengths = np.empty(n, dtype=np.int64)
+        for i in numba.prange(n):
+            lo = offsets[i]
+            hi = offsets[i + 1]
+            while hi > lo and _is_ascii_space(data[hi - 1]):
+                hi -= 1
+            # Last line starts after the final newline
+            line = lo
+            for j in range(hi - 1, lo - 1, -1):
+                if data[j] == 10:
+                    line = j + 1
+                    break
+            while line < hi and _is_ascii_space(data[line]):
+                line += 1
+            # City ends at the first comma on that line
+            end = hi
+            for j in range(line, hi):
+                if data[j] == 44:
+                    end = j
+                    break
+            while end > line and _is_ascii_space(data[end - 1]):
+                end -= 1
+            starts[i] = line
+            lengths[i] = end - line
+        return starts, lengths
+
+    @numba.njit(parallel=True, cache=True)
+    def _gather_spans(data: np.ndarray, starts: np.ndarray, out_offsets: np.ndarray) -> np.ndarray:
+        out = np.empty(out_offsets[-1], dtype=np.uint8)
+        for i in numba.prange(len(starts)):
+            o = out_offsets[i]
+            length = out_offsets[i + 1] - o
+            out[o:o + length] = data[starts[i]:starts[i] + length]
+        return out
+
+
+def _derive_city_numba(address: pd.Series) -> pd.Series:
+    """Run the compiled city parser directly on the Arrow offsets/data buffers."""
+    arr = pa.chunked_array([pa.array(address.astype("string"), from_pandas=True)]).cast(pa.large_string()).combine_chunks()
+    _validity, offsets_buf, data_buf = arr.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+    data = np.frombuffer(data_buf, dtype=np.uint8) if data_buf is not None else np.empty(0, dtype=np.uint8)
+    starts, lengths = _city_spans(data, offsets)
+    lengths[arr.is_null().to_numpy(zero_copy_only=False)] = 0
+    out_offsets = np.zeros(len(arr) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=out_offsets[1:])
+    out_data = _gather_spans(data, starts, out_offsets)
+    cities = pa.LargeStringArray.from_buffers(len(arr), pa.py_buffer(out_offsets), pa.py_buffer(out_data))
+    city = pd.Series(cities.to_numpy(zero_copy_only=False), index=address.index, dtype="string")
+    return city.where(city.ne("")).fillna("Unknown")
+
+
 def _derive_city_from_address_series(address: pd.Series) -> pd.Series:
     """Derive city name from an Address series of strings.
-    Tries to split by newline then by comma, returning the token before the comma on the last line.
+    Takes the last non-empty line and returns the token before its first comma (or the whole line).
+    Large series use the numba kernel when numba and pyarrow are installed.
     """
-    def parse(addr: object) -> Optional[str]:
-        if not isinstance(addr, str) or not addr.strip():
-            return None
-        # Normalize whitespace
-        text = "\n".join([part.strip() for part in str(addr).splitlines() if part.strip()])
-        last_line = text.split("\n")[-1]
-        # Now split by comma to get City, ST zip
-        if "," in last_line:
-            city = last_line.split(",")[0].strip()
-            return city or None
-        # Fallback: use last tokenized word group
-        return last_line.strip() or None
-
-    series = address.apply(parse)
-    # Fill any missing with 'Unknown'
-    return series.fillna("Unknown")
+    if numba is not None and pa is not None and len(address) >= NUMBA_ADDRESS_MIN_ROWS:
+        return _derive_city_numba(address)
+    text = address.astype("string").str.strip()
+    last_line = text.str.rsplit("\n", n=1).str[-1].str.strip()
+    city = last_line.str.split(",", n=1).str[0].str.strip()
+    # Empty cities (blank addresses, leading comma) fall back to 'Unknown'
+    return city.where(city.ne("")).fillna("Unknown")
 
 
 def infer_columns(df: pd.DataFrame) -> Tuple[str, str, Optional[str], Optional[str]]:
@@ -149,28 +229,47 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     rename_map = {c: c.strip() for c in df.columns}
     df.rename(columns=rename_map, inplace=True)
 
-    # Handle missing values: numeric -> median, categorical -> mode
-    for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]):
-            if df[col].isna().any():
-                df[col] = df[col].fillna(df[col].median())
-        else:
-            if df[col].isna().any():
-                df[col] = df[col].fillna(df[col].mode().iloc[0])
-
-    # Try to coerce potential numeric text columns
-    for col in df.columns:
-        if df[col].dtype == object:
-            try:
-                coerced = pd.to_numeric(df[col].astype(str).str.replace(",", "", regex=False), errors="coerce")
-                if coerced.notna().sum() > 0 and coerced.notna().sum() >= int(0.6 * len(df)):
-                    df[col] = coerced.fillna(coerced.median())
-            except Exception:
-                pass
+    # Handle missing values: numeric -> median, categorical -> mode (one batched call per dtype group,
+    # restricted to columns that actually have gaps)
+    na_cols = df.columns[df.isna().any().to_numpy()]
+    num_cols = df[na_cols].select_dtypes(include="number").columns
+    other_cols = na_cols.difference(num_cols, sort=False)
+    if len(num_cols):
+        df[num_cols] = df[num_cols].fillna(df[num_cols].median())
+    if len(other_cols):
+        modes = df[other_cols].mode()
+        if not modes.empty:
+            df[other_cols] = df[other_cols].fillna(modes.iloc[0])
+
+    # Try to coerce potential numeric text columns; keep those with >= 60% parseable values
+    text_cols = df.select_dtypes(include=["object", "string"]).columns
+    if len(text_cols):
+        coerced = df[text_cols].apply(
+            lambda s: pd.to_numeric(s.astype(str).str.replace(",", "", regex=False), errors="coerce")
+        )
+        hits = coerced.notna().sum()
+        numeric_cols = hits.index[(hits > 0) & (hits >= int(0.6 * len(df)))]
+        if len(numeric_cols):
+            df[numeric_cols] = coerced[numeric_cols].fillna(coerced[numeric_cols].median())
 
     return df
 
 
+def project_used_columns(df: pd.DataFrame, area_col: str, rent_col: Optional[str], income_col: Optional[str]) -> pd.DataFrame:
+    """Keep only the columns the app reads: inferred area/rent/income, price proxies, coordinates
+    and the known Mumbai fields. Everything else is dropped before cleaning, including the raw
+    Address once infer_columns has derived the area from it.
+    """
+    wanted = {area_col, rent_col, income_col} | MUMBAI_COLUMNS
+    wanted_lower = {"lat", "latitude", "lon", "longitude", "lng", "price", "saleprice", "houseprice", "house_price"}
+    keep = [
+        c for c in df.columns
+        if (c in wanted or str(c).lower() in wanted_lower)
+        and (str(c).lower() != "address" or c in {area_col, rent_col, income_col})
+    ]
+    return df[keep]
+
+
 def compute_affordability(df: pd.DataFrame, area_col: str, rent_col: Optional[str], income_col: Optional[str]) -> pd.DataFrame:
     df = df.copy()
 
@@ -185,47 +284,46 @@ def compute_affordability(df: pd.DataFrame, area_col: str, rent_col: Optional[st
             df["estimated_rent"] = np.nan
             rent_col = "estimated_rent"
 
-    # Determine annualized rent
-    rent_series = pd.to_numeric(df[rent_col], errors="coerce")
+    # Work on plain float arrays so index and class come out of a single pass over rent/income
+    rent = pd.to_numeric(df[rent_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
     is_monthly = "month" in rent_col.lower()
-    if is_monthly:
-        rent_annual = rent_series * 12.0
-    else:
-        rent_annual = rent_series
 
     if income_col is None:
         # heuristic: income ~ rent * factor (e.g., 3.5x monthly rent *12)
         # If rent appears to be sale price, scale down aggressively
-        series = pd.to_numeric(df[rent_col], errors="coerce")
-        if series.max() and series.max() > 1e6 and not is_monthly:
-            monthly_rent_est = series / 300.0  # crude conversion from sale price
+        rent_max = np.nanmax(rent) if np.isfinite(rent).any() else np.nan
+        if rent_max and rent_max > 1e6 and not is_monthly:
+            monthly_rent_est = rent / 300.0  # crude conversion from sale price
         else:
-            monthly_rent_est = series if is_monthly else series / 12.0
-        annual_income_est = (monthly_rent_est * 12.0) * 3.5
-        df["estimated_income"] = annual_income_est
+            monthly_rent_est = rent if is_monthly else rent / 12.0
+        df["estimated_income"] = (monthly_rent_est * 12.0) * 3.5
         income_col = "estimated_income"
 
-    income_series = pd.to_numeric(df[income_col], errors="coerce")
+    income = pd.to_numeric(df[income_col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
 
     # Compute affordability index with annualized rent / annual income
-    df["affordability_index"] = (rent_annual / income_series) * 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        idx = (rent * (12.0 if is_monthly else 1.0) / income) * 100.0
 
     # If dataset provides Affordability_Index, prefer it only if ours is missing
-    if "Affordability_Index" in df.columns and df["affordability_index"].isna().any():
-        fallback = pd.to_numeric(df["Affordability_Index"], errors="coerce")
-        df["affordability_index"] = df["affordability_index"].fillna(fallback)
-
-    # Classify
-    def classify(idx: float) -> str:
-        if pd.isna(idx):
-            return "Unknown"
-        if idx < 30:
-            return "Affordable"
-        if idx <= 50:
-            return "Moderate"
-        return "Expensive"
-
-    df["affordability_class"] = df["affordability_index"].apply(classify)
+    missing = np.isnan(idx)
+    if "Affordability_Index" in df.columns and missing.any():
+        fallback = pd.to_numeric(df["Affordability_Index"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        idx = np.where(missing, fallback, idx)
+        missing = np.isnan(idx)
+    df["affordability_index"] = idx
+
+    # Classify with vectorized comparisons; NaN indices are 'Unknown'
+    conds = [missing, idx < 30, idx <= 50]
+    choices = ["Unknown", "Affordable", "Moderate"]
+    df["affordability_class"] = pd.Categorical(
+        np.select(conds, choices, default="Expensive"),
+        categories=AFFORDABILITY_CLASSES,
+    )
+
+    # Categorical group keys let later groupbys hash integer codes instead of strings
+    if area_col in df.columns:
+        df[area_col] = df[area_col].astype("category")
 
     # Normalize column names we will use later
     standard_cols = {
@@ -239,9 +337,29 @@ def compute_affordability(df: pd.DataFrame, area_col: str, rent_col: Optional[st
     return df
 
 
+def to_contiguous_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild df so each numeric column is a contiguous NumPy buffer.
+
+    Arrow-backed or fragmented numeric columns become plain 1D arrays, which pandas stores
+    column-major, so median/quantile/groupby reductions stream a single buffer per column.
+    Non-numeric columns (categoricals, strings) are kept as-is.
+    """
+    def as_contiguous(s: pd.Series):
+        if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            return s
+        arr = s.to_numpy()
+        if arr.dtype == object:
+            arr = s.to_numpy(dtype=float, na_value=np.nan)
+        return np.ascontiguousarray(arr)
+
+    out = pd.DataFrame({c: as_contiguous(df[c]) for c in df.columns}, index=df.index)
+    out.attrs = df.attrs
+    return out
+
+
 def summarize_affordability(df: pd.DataFrame, area_col: str) -> pd.DataFrame:
     grouped = (
-        df.groupby([area_col, "affordability_class"], dropna=False)["affordability_index"]
+        df.groupby([area_col, "affordability_class"], observed=True, dropna=False)["affordability_index"]
         .median()
         .reset_index()
         .rename(columns={"affordability_index": "median_affordability_index"})
@@ -249,6 +367,39 @@ def summarize_affordability(df: pd.DataFrame, area_col: str) -> pd.DataFrame:
     return grouped
 
 
+def lttb_downsample_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Pick n_out row positions with Largest-Triangle-Three-Buckets on x-sorted points.
+
+    Keeps the first and last points and, for each bucket in between, the point forming the
+    largest triangle with the previously kept point and the next bucket's average.
+    Returns positions into the original (unsorted) arrays.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    order = np.argsort(x, kind="mergesort")
+    xs = np.asarray(x, dtype=float)[order]
+    ys = np.asarray(y, dtype=float)[order]
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = xs[end:edges[i + 2]].mean()
+            avg_y = ys[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = xs[-1], ys[-1]
+        area = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a]) - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return order[selected]
+
+
 def recommend_actions(df: pd.DataFrame, area_col: str, top_k: int = 3) -> list[str]:
     s = df[[area_col, "affordability_index"]].dropna()
     if s.empty:
@@ -290,7 +441,20 @@ def load_dataset(data_dir: str) -> Tuple[pd.DataFrame, str]:
     csv_path = load_first_csv_in_dir(data_dir)
     if not csv_path:
         raise FileNotFoundError("No CSV found in data directory.")
-    df = pd.read_csv(csv_path)
+    # Peek at the header so only the columns the app uses are parsed. Generic CSVs are read whole
+    # because infer_columns needs to see all of their columns.
+    header_cols = pd.read_csv(csv_path, nrows=0).columns
+    usecols = None
+    if {"Neighborhood", "Avg_Rent_Monthly_INR", "Median_Annual_Household_Income_INR"}.issubset(header_cols):
+        usecols = [c for c in header_cols if c in MUMBAI_COLUMNS]
+    if pa is None:
+        df = pd.read_csv(csv_path, usecols=usecols)
+    elif usecols is not None:
+        df = pd.read_csv(csv_path, engine="pyarrow", usecols=usecols, dtype_backend="pyarrow")
+    else:
+        # The pyarrow engine cannot enable newlines_in_values, so multi-line quoted fields
+        # (e.g. US-style Address columns) in larger files only parse with the C engine.
+        df = pd.read_csv(csv_path, dtype_backend="pyarrow")
     return df, csv_path
 
 
@@ -317,10 +481,11 @@ def estimate_struggling(df: pd.DataFrame, area_col: str, threshold: float = 50.0
     overall_count = int((series > threshold).sum())
     overall_pct = (overall_count / overall_total) if overall_total else 0.0
     per_area = (
-        df.assign(_struggling=series > threshold)
-        .groupby(area_col)
+        df.assign(_struggling=(series > threshold).astype("int8"))
+        .groupby(area_col, observed=True)
         .agg(struggling_count=("_struggling", "sum"), total=("_struggling", "count"))
         .reset_index()
     )
-    per_area["struggling_pct"] = per_area.apply(lambda r: (r["struggling_count"] / r["total"]) if r["total"] else 0.0, axis=1)
+    total = per_area["total"].to_numpy()
+    per_area["struggling_pct"] = per_area["struggling_count"].to_numpy() / np.where(total > 0, total, 1)
     return overall_count, overall_pct, per_area